@@ -0,0 +1,21 @@
+"""
+Optional dependencies shared by the example programs.
+Each falls back gracefully when the package is not installed.
+"""
+
+try:
+    import orjson  # Fast JSON library - encodes straight to bytes, the wire format
+except ImportError:
+    # Fall back to the standard library behind the same bytes-in/bytes-out interface
+    import json
+    from types import SimpleNamespace
+    orjson = SimpleNamespace(
+        dumps=lambda obj: json.dumps(obj, separators=(",", ":")).encode("utf-8"),
+        loads=json.loads
+    )
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support for httpx (pip install 'httpx[http2]')
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
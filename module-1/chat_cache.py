@@ -0,0 +1,126 @@
+"""
+Example implementation for API Fundamentals course.
+Demonstrates client-side response caching: exact-match and semantic lookup.
+"""
+
+import os
+import sqlite3
+import hashlib
+from typing import Dict, List, Optional
+from _compat import orjson
+
+
+class ResponseCache:
+    """Two-tier cache of chat replies, persisted in a SQLite file.
+
+    Tier 1 (exact): keyed on the full request context - model, system message
+    and every message - so a hit is exactly the request that was answered before.
+    Tier 2 (semantic): for the opening question of a conversation to the same
+    model with the same system message, a stored
+    reply is reused when a new question's embedding is nearly identical
+    (cosine similarity >= threshold). Needs sentence-transformers; without
+    it only the exact tier is used.
+    """
+
+    def __init__(self, path: str, similarity_threshold: float = 0.97,
+                 embedding_model: str = "all-MiniLM-L6-v2"):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.similarity_threshold = similarity_threshold
+
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS exact (key BLOB PRIMARY KEY, reply TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS semantic (model TEXT, system TEXT, question TEXT, embedding BLOB, reply TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, embedding BLOB)")
+
+        # Imported here rather than at module level: loading the embedding
+        # model (and torch) takes seconds and is only needed when caching is on
+        try:
+            import numpy
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            self._np = None
+            self._model = None
+        else:
+            self._np = numpy
+            self._model = SentenceTransformer(embedding_model)
+        self._embedding_model = embedding_model
+        # Embeddings memoized by text hash (also persisted in the embeddings table),
+        # so a repeated question never runs the embedding model twice
+        self._embeddings: Dict[bytes, object] = {}
+
+        # In-memory index per (model, system message): (normalized embeddings matrix, replies).
+        # A brute-force inner product is plenty for the size of a personal cache
+        self._index: Dict[tuple, tuple] = {}
+        if self._model is not None:
+            rows = self._db.execute("SELECT model, system, embedding, reply FROM semantic")
+            for model, system, embedding, reply in rows:
+                self._add_to_index((model, system), self._np.frombuffer(embedding, dtype=self._np.float32), reply)
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _exact_key(model: str, system_message: str, messages: List[Dict[str, str]]) -> bytes:
+        # Hash the serialized context so arbitrarily long histories make a fixed-size key
+        return hashlib.blake2b(orjson.dumps([model, system_message, messages]), digest_size=16).digest()
+
+    def _embed(self, text: str):
+        # The model name is part of the key - a different model gives different vectors
+        key = hashlib.blake2b(f"{self._embedding_model}\0{text}".encode("utf-8"), digest_size=16).digest()
+        embedding = self._embeddings.get(key)
+        if embedding is not None:
+            return embedding
+
+        row = self._db.execute("SELECT embedding FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row:
+            embedding = self._np.frombuffer(row[0], dtype=self._np.float32)
+        else:
+            embedding = self._model.encode([text], normalize_embeddings=True)[0].astype(self._np.float32)
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)", (key, embedding.tobytes()))
+        self._embeddings[key] = embedding
+        return embedding
+
+    def _add_to_index(self, index_key: tuple, embedding, reply: str):
+        matrix, replies = self._index.get(index_key, (None, []))
+        row = embedding[None, :]
+        matrix = row if matrix is None else self._np.vstack((matrix, row))
+        self._index[index_key] = (matrix, replies + [reply])
+
+    def lookup(self, model: str, system_message: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        """Return a cached reply for this request context, or None on a miss."""
+        row = self._db.execute(
+            "SELECT reply FROM exact WHERE key = ?", (self._exact_key(model, system_message, messages),)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        # Semantic matching ignores history, so only use it for opening questions
+        index_key = (model, system_message)
+        if self._model is None or len(messages) != 1 or index_key not in self._index:
+            return None
+        matrix, replies = self._index[index_key]
+        similarities = matrix @ self._embed(messages[0]["content"])
+        best = int(similarities.argmax())
+        if similarities[best] >= self.similarity_threshold:
+            return replies[best]
+        return None
+
+    def store(self, model: str, system_message: str, messages: List[Dict[str, str]], reply: str):
+        """Remember the reply to this request context."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO exact (key, reply) VALUES (?, ?)",
+                (self._exact_key(model, system_message, messages), reply)
+            )
+            if self._model is not None and len(messages) == 1:
+                question = messages[0]["content"]
+                embedding = self._embed(question)
+                self._db.execute(
+                    "INSERT INTO semantic (model, system, question, embedding, reply) VALUES (?, ?, ?, ?, ?)",
+                    (model, system_message, question, embedding.tobytes(), reply)
+                )
+                self._add_to_index((model, system_message), embedding, reply)
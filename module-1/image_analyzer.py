@@ -5,58 +5,257 @@ Demonstrates multi-modal content handling, base64 encoding, and content-type man
 """
 
 import os
+import re
 import sys
+import uuid
+import io
+import time
 import base64  # For encoding binary image data to text format
-import json
-import requests  # Direct HTTP interaction for educational transparency
+import httpx  # Direct HTTP interaction for educational transparency
 import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional, Union
 from dotenv import load_dotenv
+from _compat import HTTP2_AVAILABLE, orjson
+
+try:
+    from PIL import Image, ImageOps  # Optional: downscale large images before upload
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
 
 # Security: Load sensitive data from environment
 load_dotenv()
 
-# Content-Type handling: Different image formats require different MIME types
-SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+# Content-Type handling: Different image formats require different MIME types.
+# The format is read from the file's first bytes ("magic numbers") rather than
+# trusted from the extension, so a misnamed file still gets the right type.
+# One table: (magic number pattern, MIME type, usual file extensions)
+_MAGIC = (
+    (rb"\x89PNG", "image/png", ('.png',)),
+    (rb"\xff\xd8\xff", "image/jpeg", ('.jpg', '.jpeg')),
+    (rb"GIF8[79]a", "image/gif", ('.gif',)),
+    (rb"RIFF....WEBP", "image/webp", ('.webp',)),
+)
+# Compiled into one pattern: the group that matches gives the table row
+_MAGIC_PATTERN = re.compile(b"|".join(b"(" + pattern + b")" for pattern, _, _ in _MAGIC), re.DOTALL)
+# Accepted file extensions, derived from the table so the two cannot drift apart
+SUPPORTED_FORMATS = {extension for _, _, extensions in _MAGIC for extension in extensions}
+HEADER_SIZE = 12  # Enough bytes to recognise every supported format
+
+# The model downsizes large images itself, so pixels beyond this are wasted upload.
+# Larger JPEG/PNG files are resized (and JPEGs recompressed) before encoding
+DEFAULT_MAX_DIM = 2048
+DEFAULT_QUALITY = 85
+
+# Same endpoint as text-only chatbot - REST uniform interface principle
+# The API determines behavior based on content, not different URLs
+API_URL = "https://api.openai.com/v1/chat/completions"
+
+# Images are sent together in one request until their base64 data reaches
+# this size; larger sets are split into several concurrent requests
+MAX_BATCH_BYTES = 18 * 1024 * 1024
+# At most this many batches are encoded and in flight at once, which
+# bounds memory to a few batches however many images are given
+MAX_CONCURRENT_BATCHES = 4
+
+# With several images in one request the model is asked to start each answer
+# with "Image <number>:", so the single reply can be split per image
+PER_IMAGE_INSTRUCTION = "Answer for each image separately, starting each answer on a new line with 'Image <number>:'."
+_ANSWER_HEADING = re.compile(r"^[#* ]*Image (\d+)[^\n:]*:\**[ \t]*", re.MULTILINE)
+
+# Rate limits and server errors are retried with exponential backoff
+# (0.5s, 1s, 2s) before the error is reported
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds
+
+# Shared HTTP client - repeated analyze_image() calls reuse the same
+# TCP+TLS connection (HTTP keep-alive) instead of handshaking every time.
+# HTTP/2 (when available) compresses headers with HPACK
+_CLIENT = httpx.Client(
+    # The transport retries failed connection attempts; status-based
+    # retries are handled in _send_batch
+    transport=httpx.HTTPTransport(
+        http2=HTTP2_AVAILABLE,
+        retries=MAX_RETRIES,
+        limits=httpx.Limits(max_keepalive_connections=8)
+    ),
+    timeout=60.0  # Larger timeout for image uploads and processing
+)
 
 
-def encode_image(image_path: str) -> tuple[str, str]:
+def sniff_media_type(header: bytes) -> Optional[str]:
+    """Return the MIME type for an image file's first bytes, or None if unsupported."""
+    match = _MAGIC_PATTERN.match(header)
+    return _MAGIC[match.lastindex - 1][1] if match else None
+
+
+def _downscale(image_file, media_type: str, max_dim: int, quality: int) -> Optional[bytes]:
+    """Return a resized copy of a large JPEG/PNG, or None to send the original file."""
+    # GIF/WEBP pass through untouched to keep animation and transparency
+    if not PIL_AVAILABLE or not max_dim or media_type not in ("image/jpeg", "image/png"):
+        return None
+    
+    image_file.seek(0)
+    try:
+        with Image.open(image_file) as img:
+            if max(img.size) <= max_dim:
+                return None
+            # Apply the EXIF orientation first - the resized copy does not keep EXIF data
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+            buffer = io.BytesIO()
+            if media_type == "image/jpeg":
+                img.save(buffer, format="JPEG", quality=quality, optimize=True)
+            else:
+                img.save(buffer, format="PNG", optimize=True)
+    except (OSError, Image.DecompressionBombError):
+        # Resizing is only an optimization - let the API judge the original file
+        return None
+    return buffer.getvalue()
+
+
+def encode_image(image_path: str, max_dim: int = DEFAULT_MAX_DIM,
+                 quality: int = DEFAULT_QUALITY) -> tuple[Union[bytes, bytearray], str]:
     """Encode image to base64 and return with media type.
     
     Base64 encoding converts binary image data to text format,
     allowing images to be included in JSON payloads.
     Alternative to multipart/form-data for simpler implementation.
+    The file is encoded in chunks into a bytearray of ASCII base64, so the
+    raw image is never held in memory alongside its base64 copy (a resized
+    image comes back as bytes; both work wherever bytes are accepted).
+    With Pillow installed, JPEG/PNG images larger than max_dim pixels are
+    resized first (max_dim=0 disables this).
     """
-    path = Path(image_path)
-    suffix = path.suffix.lower()
-    
-    # Map file extensions to MIME types (media types)
-    # These tell the API how to interpret the image data
-    if suffix == '.jpg':
-        media_type = "image/jpeg"
-    elif suffix == '.jpeg':
-        media_type = "image/jpeg"
-    elif suffix == '.png':
-        media_type = "image/png"
-    elif suffix == '.gif':
-        media_type = "image/gif"
-    elif suffix == '.webp':
-        media_type = "image/webp"
-    else:
-        raise ValueError(f"Unsupported image format: {suffix}")
-    
-    # Read binary image data and encode to base64 text
-    with open(image_path, "rb") as image_file:
-        encoded = base64.b64encode(image_file.read()).decode('utf-8')
+    # The file is opened once: format detection, resizing and encoding
+    # all read from the same handle
+    with open(image_path, "rb", buffering=1 << 20) as image_file:
+        # Hint a sequential read so the OS reads ahead while we encode (Linux/Unix only)
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(image_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        
+        # Map the file's magic number to its MIME type (media type)
+        # This tells the API how to interpret the image data
+        header = image_file.read(HEADER_SIZE)
+        media_type = sniff_media_type(header)
+        if media_type is None:
+            raise ValueError(f"Unsupported image format: {Path(image_path).name} "
+                             f"(supported: {', '.join(sorted(SUPPORTED_FORMATS))})")
+        
+        # Smaller image = less base64 work and far fewer bytes on the wire
+        resized = _downscale(image_file, media_type, max_dim, quality)
+        if resized is not None:
+            return base64.b64encode(resized), media_type
+        image_file.seek(HEADER_SIZE)
+        
+        # Read binary image data in chunks and encode to base64 text.
+        # The header and 57 KiB chunks are multiples of 3 bytes, so chunk boundaries
+        # never need padding and the result matches encoding the whole file at once
+        encoded = bytearray(base64.b64encode(header))
+        while chunk := image_file.read(57 * 1024):
+            encoded += base64.b64encode(chunk)
     
     return encoded, media_type
 
 
-def analyze_image(image_path: str, prompt: str = None) -> str:
-    """Analyze image using OpenAI API.
+def _split_answers(reply: str, count: int) -> list[str]:
+    """Split a reply to a batch into one answer per image.
     
-    Demonstrates sending multi-modal content (text + image)
-    through a single API endpoint.
+    If the reply does not follow the "Image <number>:" layout, every image
+    gets the whole reply.
+    """
+    if count == 1:
+        return [reply]
+    headings = list(_ANSWER_HEADING.finditer(reply))
+    if [int(heading.group(1)) for heading in headings] != list(range(1, count + 1)):
+        return [reply] * count
+    ends = [heading.start() for heading in headings[1:]] + [len(reply)]
+    return [reply[heading.end():end].strip() for heading, end in zip(headings, ends)]
+
+
+def _send_batch(image_paths: list[str], user_prompt: str, headers: dict,
+                max_dim: int, quality: int) -> list[str]:
+    """Encode the batch's images, send them in one request and return one answer per image."""
+    # Images are encoded only when their batch is sent, so a large set is
+    # never held in memory all at once
+    images = [encode_image(image_path, max_dim, quality) for image_path in image_paths]
+    
+    # Each image URL starts out as a unique placeholder; the base64 data is
+    # spliced in after JSON encoding (see below)
+    placeholder = f"image-data-{uuid.uuid4().hex}"
+    
+    # Content array can mix different types (text, image, etc.)
+    if len(image_paths) > 1:
+        user_prompt = f"{user_prompt}\n\n{PER_IMAGE_INSTRUCTION}"
+    content = [{"type": "text", "text": user_prompt}]
+    for number, image_path in enumerate(image_paths, 1):
+        if len(image_paths) > 1:
+            # Label each image so the answer can refer to it
+            content.append({"type": "text", "text": f"Image {number}: {Path(image_path).name}"})
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": placeholder
+            }
+        })
+    
+    # Multi-modal content in request body (OpenAI format)
+    payload = {
+        "model": "gpt-4o-mini",  # OpenAI's vision-capable model
+        "max_tokens": 4096,
+        "messages": [{
+            "role": "user",
+            "content": content
+        }]
+    }
+    
+    # Encode the small JSON skeleton, then put each image's data URL
+    # ("data:<media type>;base64,<data>") where its placeholder was. Base64 text
+    # needs no JSON escaping, so the large image bytes are copied exactly once,
+    # straight into the request body
+    pieces = orjson.dumps(payload).split(placeholder.encode("ascii"))
+    parts = [pieces[0]]
+    for (base64_image, media_type), piece in zip(images, pieces[1:]):
+        parts += [b"data:", media_type.encode("ascii"), b";base64,", base64_image, piece]
+    body = b"".join(parts)
+    # The request body now holds the only copy the upload needs
+    del images, parts
+    
+    # POST request with longer timeout for image processing
+    # Body is pre-encoded JSON bytes, matching the Content-Type header
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        response = _CLIENT.post(API_URL, headers=headers, content=body)
+        # Transient failure - retry, otherwise report the final response
+        if response.status_code not in RETRY_STATUSES:
+            break
+    
+    # HTTP Status Code checking - essential for robust API interaction
+    if response.status_code != 200:
+        # Parse error response for helpful debugging info
+        error_data = orjson.loads(response.content)
+        error_msg = error_data.get('error', {}).get('message', f'API Error: {response.status_code}')
+        raise Exception(error_msg)
+    
+    # Extract text response from OpenAI's response structure
+    response_data = orjson.loads(response.content)
+    return _split_answers(response_data['choices'][0]['message']['content'], len(image_paths))
+
+
+def analyze_images(image_paths: list[str], prompt: str = None, max_dim: int = DEFAULT_MAX_DIM,
+                   quality: int = DEFAULT_QUALITY) -> list[tuple[str, str]]:
+    """Analyze several images using OpenAI API.
+    
+    Demonstrates sending multi-modal content (text + images)
+    through a single API endpoint. Images share one request - one round
+    trip for the whole set - until MAX_BATCH_BYTES is reached; larger
+    sets are split into batches, up to MAX_CONCURRENT_BATCHES sent at once.
+    Returns (image path, analysis) for each image.
     """
     # Security best practice: API key from environment, never hardcoded
     api_key = os.getenv("OPENAI_API_KEY")
@@ -67,14 +266,26 @@ def analyze_image(image_path: str, prompt: str = None) -> str:
         print("OPENAI_API_KEY=your-api-key-here")
         sys.exit(1)
     
-    # Same endpoint as text-only chatbot - REST uniform interface principle
-    # The API determines behavior based on content, not different URLs
-    api_url = "https://api.openai.com/v1/chat/completions"
-    
     try:
-        base64_image, media_type = encode_image(image_path)
+        # Group the images into batches under the size limit. Sizes are
+        # estimated from the file size (base64 is 4 bytes per 3), an upper
+        # bound since resizing only makes images smaller
+        batches = [[]]
+        batch_bytes = 0
+        for image_path in image_paths:
+            encoded_size = 4 * ((os.path.getsize(image_path) + 2) // 3)
+            if batches[-1] and batch_bytes + encoded_size > MAX_BATCH_BYTES:
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append(image_path)
+            batch_bytes += encoded_size
         
-        user_prompt = prompt or "Please analyze this image and describe what you see in detail."
+        if prompt:
+            user_prompt = prompt
+        elif len(image_paths) == 1:
+            user_prompt = "Please analyze this image and describe what you see in detail."
+        else:
+            user_prompt = "Please analyze these images and describe what you see in each one in detail."
         
         # HTTP Headers - same structure as text-only requests
         headers = {
@@ -82,51 +293,15 @@ def analyze_image(image_path: str, prompt: str = None) -> str:
             "Content-Type": "application/json"     # We're sending JSON (with embedded base64)
         }
         
-        # Multi-modal content in request body (OpenAI format)
-        payload = {
-            "model": "gpt-4o-mini",  # OpenAI's vision-capable model
-            "max_tokens": 4096,
-            "messages": [{
-                "role": "user",
-                # Content array can mix different types (text, image, etc.)
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{media_type};base64,{base64_image}"  # Data URL format
-                        }
-                    }
-                ]
-            }]
-        }
-        
-        # POST request with longer timeout for image processing
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=60  # Larger timeout for image uploads and processing
-        )
-        
-        # HTTP Status Code checking - essential for robust API interaction
-        if response.status_code != 200:
-            # Parse error response for helpful debugging info
-            error_data = response.json()
-            error_msg = error_data.get('error', {}).get('message', f'API Error: {response.status_code}')
-            raise Exception(error_msg)
-        
-        # Extract text response from OpenAI's response structure
-        response_data = response.json()
-        return response_data['choices'][0]['message']['content']
+        # Batches go out in parallel threads over the shared client
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as executor:
+            answers = executor.map(lambda batch: _send_batch(batch, user_prompt, headers, max_dim, quality), batches)
+            return list(zip(image_paths, itertools.chain.from_iterable(answers)))
         
     # Comprehensive error handling for different failure modes
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise Exception("Request timed out - the image may be too large or the API is slow")
-    except requests.exceptions.RequestException as e:
+    except httpx.RequestError as e:
         # Network-level errors (connection, DNS, etc.)
         raise Exception(f"Network error: {str(e)}")
     except Exception as e:
@@ -134,49 +309,91 @@ def analyze_image(image_path: str, prompt: str = None) -> str:
         raise Exception(f"Error analyzing image: {str(e)}")
 
 
+def analyze_image(image_path: str, prompt: str = None, max_dim: int = DEFAULT_MAX_DIM,
+                  quality: int = DEFAULT_QUALITY) -> str:
+    """Analyze a single image using OpenAI API."""
+    return analyze_images([image_path], prompt, max_dim, quality)[0][1]
+
+
+def _int_arg(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a whole number: {value!r}")
+
+
+def _max_dim_arg(value: str) -> int:
+    max_dim = _int_arg(value)
+    if max_dim < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {max_dim}")
+    return max_dim
+
+
+def _quality_arg(value: str) -> int:
+    # Pillow's JPEG quality scale; above 95 only grows the file
+    quality = _int_arg(value)
+    if not 1 <= quality <= 95:
+        raise argparse.ArgumentTypeError(f"must be between 1 and 95, got {quality}")
+    return quality
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze images using OpenAI GPT-4o-mini",
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="Example:\n  python image_analyzer.py photo.jpg\n  python image_analyzer.py photo.png --prompt 'What objects are in this image?'"
+        epilog="Example:\n  python image_analyzer.py photo.jpg\n  python image_analyzer.py photo.png --prompt 'What objects are in this image?'\n  python image_analyzer.py before.jpg after.jpg --prompt 'What changed?'"
     )
     
-    parser.add_argument('image_path', help='Path to the image file')
+    parser.add_argument('image_path', nargs='+', help='Path to one or more image files')
     parser.add_argument(
         '--prompt', '-p',
         help='Custom prompt for image analysis (default: general description)',
         default=None
     )
+    parser.add_argument(
+        '--max-dim',
+        type=_max_dim_arg,
+        help=f'Resize JPEG/PNG images larger than this many pixels before upload, 0 to disable (default: {DEFAULT_MAX_DIM}, needs Pillow)',
+        default=DEFAULT_MAX_DIM
+    )
+    parser.add_argument(
+        '--quality',
+        type=_quality_arg,
+        help=f'JPEG quality used when resizing, 1-95 (default: {DEFAULT_QUALITY})',
+        default=DEFAULT_QUALITY
+    )
     
     args = parser.parse_args()
     
-    # Validate image path
-    image_path = Path(args.image_path)
+    # Validate image paths - the format itself is checked by encode_image(),
+    # so each file is opened and read only once
+    image_paths = [Path(path) for path in args.image_path]
     
-    if not image_path.exists():
-        print(f"Error: File not found: {args.image_path}", file=sys.stderr)
-        sys.exit(1)
-    
-    if not image_path.is_file():
-        print(f"Error: Not a file: {args.image_path}", file=sys.stderr)
-        sys.exit(1)
-    
-    if image_path.suffix.lower() not in SUPPORTED_FORMATS:
-        print(f"Error: Unsupported format: {image_path.suffix}", file=sys.stderr)
-        print(f"Supported formats: {', '.join(SUPPORTED_FORMATS)}")
-        sys.exit(1)
+    for image_path in image_paths:
+        if not image_path.exists():
+            print(f"Error: File not found: {image_path}", file=sys.stderr)
+            sys.exit(1)
+        
+        if not image_path.is_file():
+            print(f"Error: Not a file: {image_path}", file=sys.stderr)
+            sys.exit(1)
     
-    # Analyze image
+    # Analyze images
     print("="*50)
-    print(f"Analyzing Image: {image_path.name}")
+    print(f"Analyzing Image{'s' if len(image_paths) > 1 else ''}: {', '.join(path.name for path in image_paths)}")
     print("="*50)
     
-    print("Processing image...")
+    print("Processing image..." if len(image_paths) == 1 else "Processing images...")
     try:
-        result = analyze_image(str(image_path), args.prompt)
+        results = analyze_images([str(path) for path in image_paths], args.prompt, args.max_dim, args.quality)
         
-        print("\nAnalysis Result:\n")
-        print(result)
+        # Images whose answer could not be told apart share one result block
+        for result, group in itertools.groupby(results, key=lambda item: item[1]):
+            if len(results) > 1:
+                print(f"\nAnalysis Result ({', '.join(Path(path).name for path, _ in group)}):\n")
+            else:
+                print("\nAnalysis Result:\n")
+            print(result)
         
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Example implementation for API Fundamentals course.
+Demonstrates concurrent API requests: comparing models side by side and hedged requests.
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+from typing import List, Tuple
+from dotenv import load_dotenv
+from openai_chatbot import OpenAIChatbot
+
+# Security: Load sensitive data from environment
+load_dotenv()
+
+
+async def _collect(chatbot: OpenAIChatbot, prompt: str) -> str:
+    # chat_stream() raises on failure (chat() would return the error as text),
+    # so a failed request can never "win" a race
+    return "".join([chunk async for chunk in chatbot.chat_stream(prompt)])
+
+
+class MultiChatbot:
+    """Send the same prompt to several chatbots concurrently.
+
+    The requests are I/O-bound, so running them at the same time costs about
+    as long as the slowest one (chat_all) - or the fastest one (chat_first).
+    Each chatbot keeps its own history; chat_first only records the turn in
+    the history of the chatbot that answered.
+    """
+
+    def __init__(self, chatbots: List[OpenAIChatbot]):
+        if not chatbots:
+            raise ValueError("MultiChatbot needs at least one chatbot")
+        self.chatbots = chatbots
+
+    async def chat_all(self, prompt: str) -> List[str]:
+        """Return every chatbot's reply (or error message), in order."""
+        return await asyncio.gather(*(chatbot.chat(prompt) for chatbot in self.chatbots))
+
+    async def chat_first(self, prompt: str) -> Tuple[OpenAIChatbot, str]:
+        """Return the first successful reply and the chatbot that gave it.
+
+        "Hedged request" pattern: the slower requests are cancelled as soon
+        as one succeeds, which cuts tail latency when one backend is slow.
+        """
+        tasks = {asyncio.create_task(_collect(chatbot, prompt)): chatbot for chatbot in self.chatbots}
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                # Retrieve every finished task's outcome, so no failure goes unobserved
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                if winner is not None:
+                    return tasks[winner], winner.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+        await asyncio.gather(*(chatbot.close() for chatbot in self.chatbots))
+
+
+async def run(models: List[str], prompt: str, first: bool):
+    api_key = os.getenv("OPENAI_API_KEY")
+    multi = MultiChatbot([OpenAIChatbot(api_key, model=model) for model in models])
+    try:
+        if first:
+            chatbot, reply = await multi.chat_first(prompt)
+            print(f"[{chatbot.model}] answered first:\n")
+            print(reply)
+        else:
+            for model, reply in zip(models, await multi.chat_all(prompt)):
+                print("="*50)
+                print(model)
+                print("="*50)
+                print(reply)
+    finally:
+        await multi.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Send one prompt to several OpenAI models at the same time",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Example:\n  python multi_chatbot.py 'What is REST?'\n  python multi_chatbot.py 'What is REST?' --models gpt-4o-mini gpt-4o --first"
+    )
+
+    parser.add_argument('prompt', help='Prompt sent to every model')
+    parser.add_argument(
+        '--models', '-m',
+        nargs='+',
+        help='Models to query (default: gpt-4o-mini gpt-4o)',
+        default=["gpt-4o-mini", "gpt-4o"]
+    )
+    parser.add_argument(
+        '--first',
+        action='store_true',
+        help='Only print the fastest successful reply and cancel the rest'
+    )
+
+    args = parser.parse_args()
+
+    # Security best practice: API key from environment, never hardcoded
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not found in environment variables.", file=sys.stderr)
+        print("Please create a .env file with your API key:")
+        print("OPENAI_API_KEY=your-api-key-here")
+        sys.exit(1)
+
+    try:
+        asyncio.run(run(args.models, args.prompt, args.first))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
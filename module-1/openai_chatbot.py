@@ -6,98 +6,382 @@ Demonstrates HTTP request/response, REST principles, and API security.
 
 import os
 import sys
-import json
-import requests  # Using requests library for transparency into HTTP mechanics
-from typing import List, Dict
+import uuid
+import asyncio
+import threading
+import httpx  # Using httpx library for transparency into HTTP mechanics
+from typing import AsyncIterator, Callable, Dict, List, Optional
 from dotenv import load_dotenv
+from _compat import HTTP2_AVAILABLE, orjson
+from chat_cache import ResponseCache
+
+# While the user is typing, the idle connection is touched every so often so the
+# server does not close it before the next message (capped to avoid pinging forever)
+KEEP_WARM_INTERVAL = 20.0  # seconds
+KEEP_WARM_PINGS = 15
+
+# Rate limits and server errors are retried with exponential backoff
+# (0.5s, 1s, 2s) before the error is reported
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds
 
 # Load API key from .env file - Security best practice: Never hardcode API keys!
 load_dotenv()
 
 
+async def _iter_body(pieces: tuple) -> AsyncIterator[bytes]:
+    for piece in pieces:
+        yield piece
+
+
 class OpenAIChatbot:
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", cache: Optional[str] = None):
         self.api_key = api_key
         # API URL structure: protocol (https) + domain (api.openai.com) + path (/v1/chat/completions)
         # The 'v1' indicates API version - following REST uniform interface principle
         self.api_url = "https://api.openai.com/v1/chat/completions"
-        self.model = model
+        # Cheap GET (a single model's details) used to keep the connection warm
+        self.models_url = f"https://api.openai.com/v1/models/{model}"
+        # Read-only (see the model property): the request head and models_url are built from it once
+        self._model = model
         # Store conversation history to demonstrate REST statelessness principle
         # Each request must contain complete context
         self.messages: List[Dict[str, str]] = []
-        self.system_message = "You are a helpful assistant."
+        self.set_system_message("You are a helpful assistant.")
+        # Sliding-window memory: oldest exchanges are dropped once the history
+        # exceeds this budget, keeping every request's payload bounded
+        self.max_history_tokens = 16000
+        self._history_chars = 0  # Running total of message characters, kept in step with self.messages
+        # JSON encoding of the history is cached between turns: each message is
+        # serialized once as b',{...}' into _serialized_prefix, with its byte size
+        # in _fragment_sizes, so each turn only encodes the new messages
+        self._serialized_prefix = bytearray()
+        self._fragment_sizes: List[int] = []
+        # OpenAI caches shared prompt prefixes server-side automatically; a stable
+        # key per chatbot routes every turn to the same cache so the unchanged
+        # system message + history prefix is reused instead of reprocessed
+        self._prompt_cache_key = uuid.uuid4().hex
+        # Optional client-side cache of replies (path to a SQLite file) -
+        # repeated questions are answered without any HTTP request
+        self.cache = ResponseCache(cache) if cache else None
+        # Static part of every request body, encoded once:
+        # {"model": ..., "max_tokens": 4096, "stream": true, "prompt_cache_key": ..., "messages": [
+        self._payload_head = b"".join((
+            b'{"model":', orjson.dumps(model),
+            b',"max_tokens":4096,"stream":true,"prompt_cache_key":"', self._prompt_cache_key.encode("ascii"),
+            b'","messages":['
+        ))
+        self._keep_warm_task: Optional[asyncio.Task] = None
+        self._keep_warm_stop = asyncio.Event()
+        self._stream_finished = False
+        
+        # A Client keeps the TCP+TLS connection alive between turns (HTTP keep-alive),
+        # so only the first message pays for the handshake. HTTP/2 (when available)
+        # also compresses headers and can multiplex concurrent requests on one connection
+        # AsyncClient lets network I/O overlap with waiting for user input
+        self.client = httpx.AsyncClient(
+            # The transport retries failed connection attempts; status-based
+            # retries are handled in _request_stream
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                retries=MAX_RETRIES,
+                limits=httpx.Limits(max_keepalive_connections=8)
+            ),
+            # HTTP Request Headers - metadata sent automatically with every request
+            headers={
+                "Authorization": f"Bearer {self.api_key}",  # Bearer token authentication (OpenAI format)
+                "Content-Type": "application/json"          # Tells server we're sending JSON data
+            },
+            timeout=30.0  # Network timeout for resilience
+        )
+        
+    @property
+    def model(self) -> str:
+        # No setter: a new model would need a new payload head, models_url and
+        # cache key, so create a new chatbot instead
+        return self._model
         
     def set_system_message(self, message: str):
         self.system_message = message
+        # OpenAI format: system message is part of the messages array
+        self._system_fragment = orjson.dumps({"role": "system", "content": message})
+        
+    def set_history_budget(self, tokens: int):
+        self.max_history_tokens = tokens
+        self._trim_history()
+        
+    def keep_warm(self):
+        """Start warming the connection in the background (call while waiting for input)."""
+        # Already warming - don't restart (and re-send) the pings
+        if self._keep_warm_task and not self._keep_warm_task.done() and not self._keep_warm_stop.is_set():
+            return
+        self._keep_warm_stop = asyncio.Event()
+        self._keep_warm_task = asyncio.create_task(self._keep_warm(self._keep_warm_stop))
+        
+    async def _stop_keep_warm(self):
+        # Signal the task, then let a GET already in flight finish: cancelling it
+        # would drop the very connection it is warming up, and over HTTP/1.1 a
+        # request sent meanwhile would open a second connection instead of reusing it
+        self._keep_warm_stop.set()
+        if self._keep_warm_task and not self._keep_warm_task.done():
+            await self._keep_warm_task
+        
+    async def _keep_warm(self, stop: asyncio.Event):
+        # The first request opens the TCP+TLS connection ahead of time; the
+        # rest stop it from being closed as idle during long pauses
+        for _ in range(KEEP_WARM_PINGS):
+            try:
+                response = await self.client.get(self.models_url)
+            except httpx.HTTPError:
+                return
+            # An error status (e.g. 401 for a bad key) won't improve by pinging again
+            if response.status_code != 200:
+                return
+            # Sleep until the next ping, waking early if stopped
+            try:
+                await asyncio.wait_for(stop.wait(), KEEP_WARM_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+        
+    async def close(self):
+        # Release pooled connections when the chatbot is no longer needed
+        if self._keep_warm_task:
+            self._keep_warm_task.cancel()
+            # Wait for the cancelled task to unwind before its client is closed
+            await asyncio.gather(self._keep_warm_task, return_exceptions=True)
+        await self.client.aclose()
+        if self.cache:
+            self.cache.close()
         
     def clear_conversation(self):
         self.messages = []
+        self._history_chars = 0
+        self._reset_prefix()
         print("Conversation cleared.")
         
-    def chat(self, user_input: str) -> str:
-        # Add user message to history for stateless communication
-        self.messages.append({"role": "user", "content": user_input})
+    def _reset_prefix(self):
+        self._serialized_prefix.clear()
+        self._fragment_sizes.clear()
         
-        try:
-            # HTTP Request Headers - metadata about the request
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",  # Bearer token authentication (OpenAI format)
-                "Content-Type": "application/json"          # Tells server we're sending JSON data
-            }
-            
-            # HTTP Request Body - the actual data we're sending
-            # JSON format as specified by Content-Type header
-            # OpenAI format: system message is part of the messages array
-            full_messages = [{"role": "system", "content": self.system_message}] + self.messages
-            
-            payload = {
-                "model": self.model,
-                "max_tokens": 4096,
-                "messages": full_messages  # Full history including system message = REST statelessness
-            }
-            
-            # HTTP POST method - used for sending data and expecting a response
-            # (vs GET which only retrieves data)
-            response = requests.post(
+    def _append_message(self, message: Dict[str, str], fragment: Optional[bytes] = None):
+        self.messages.append(message)
+        self._history_chars += len(message["content"])
+        # Reuse the message's JSON if it was already encoded for the request
+        if fragment is not None and len(self._fragment_sizes) == len(self.messages) - 1:
+            self._serialized_prefix += fragment
+            self._fragment_sizes.append(len(fragment))
+        
+    def _trim_history(self):
+        # Approximate tokens as characters / 4 - close enough for a budget
+        budget_chars = self.max_history_tokens * 4
+        
+        # Drop the oldest user/assistant pairs, always keeping the latest exchange
+        dropped = 0
+        while self._history_chars > budget_chars and len(self.messages) - dropped > 2:
+            self._history_chars -= len(self.messages[dropped]["content"]) + len(self.messages[dropped + 1]["content"])
+            dropped += 2
+        if dropped:
+            del self.messages[:dropped]
+            # Cut the same messages from the front of the serialized prefix
+            encoded = min(dropped, len(self._fragment_sizes))
+            del self._serialized_prefix[:sum(self._fragment_sizes[:encoded])]
+            del self._fragment_sizes[:encoded]
+        
+    def _encode_payload(self, new_fragment: bytes) -> tuple:
+        # Serialize only the messages added since the last request
+        for message in self.messages[len(self._fragment_sizes):]:
+            fragment = b"," + orjson.dumps(message)
+            self._serialized_prefix += fragment
+            self._fragment_sizes.append(len(fragment))
+        
+        # Together these pieces are the same JSON as encoding this dict in one go:
+        # {"model": ..., "max_tokens": 4096, "stream": true, "prompt_cache_key": ...,
+        #  "messages": [system message, *self.messages, new message]}
+        # They are sent one after another rather than joined, so no new
+        # payload-sized buffer is allocated per turn
+        return (
+            self._payload_head,
+            self._system_fragment,
+            self._serialized_prefix,  # Full history = REST statelessness
+            new_fragment,
+            b"]}"
+        )
+        
+    async def _request_stream(self, new_fragment: bytes) -> AsyncIterator[str]:
+        # HTTP Request Body - the actual data we're sending
+        # JSON format as specified by Content-Type header
+        body = self._encode_payload(new_fragment)
+        # Set once the server sends the end-of-stream marker
+        self._stream_finished = False
+        
+        # HTTP POST method - used for sending data and expecting a response
+        # (vs GET which only retrieves data)
+        # Headers are already attached to the client; the body is pre-encoded JSON bytes.
+        # Content-Length is given up front because the body is sent in pieces
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+            async with self.client.stream(
+                "POST",
                 self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=30  # Network timeout for resilience
-            )
-            
-            # Check HTTP Status Code (part of HTTP Response Status Line)
-            # 200 = OK/Success, 4xx = Client errors, 5xx = Server errors
-            if response.status_code != 200:
-                error_data = response.json()
-                error_msg = error_data.get('error', {}).get('message', f'API Error: {response.status_code}')
-                raise Exception(error_msg)
-            
-            # Parse HTTP Response Body - contains the actual AI response
-            response_data = response.json()
-            # Extract text from OpenAI's response structure
-            assistant_message = response_data['choices'][0]['message']['content']
-            # Store response for conversation continuity
-            self.messages.append({"role": "assistant", "content": assistant_message})
-            
-            return assistant_message
+                content=_iter_body(body),
+                headers={"Content-Length": str(sum(len(piece) for piece in body))}
+            ) as response:
+                # Transient failure - retry before any of the body is read
+                if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                    continue
+                
+                # Check HTTP Status Code (part of HTTP Response Status Line)
+                # 200 = OK/Success, 4xx = Client errors, 5xx = Server errors
+                if response.status_code != 200:
+                    await response.aread()
+                    error_data = orjson.loads(response.content)
+                    error_msg = error_data.get('error', {}).get('message', f'API Error: {response.status_code}')
+                    raise Exception(error_msg)
+                
+                # Parse HTTP Response Body - a stream of 'data: {...}' event lines,
+                # each carrying the next piece of the AI response
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        self._stream_finished = True
+                        break
+                    event = orjson.loads(data)
+                    # Errors can also arrive mid-stream, after the 200 status line
+                    if 'error' in event:
+                        raise Exception(event['error'].get('message', 'API Error in stream'))
+                    # Extract text from OpenAI's streaming chunk structure
+                    choices = event['choices']
+                    text = choices[0]['delta'].get('content') if choices else None
+                    if text:
+                        yield text
+                return
+        
+    async def chat_stream(self, user_input: str) -> AsyncIterator[str]:
+        """Send a message and yield the reply text as it arrives.
+        
+        Uses Server-Sent Events streaming so the first words can be shown
+        while the model is still generating the rest of the reply.
+        """
+        # The connection is about to be used for real - stop the warm-up pings
+        await self._stop_keep_warm()
+        # The user message is sent along with the history (stateless communication)
+        # but only added to the history once the reply has arrived, so a failed
+        # or abandoned turn leaves the conversation untouched
+        user_message = {"role": "user", "content": user_input}
+        user_fragment = b"," + orjson.dumps(user_message)
+        
+        cached_reply = (
+            self.cache.lookup(self.model, self.system_message, self.messages + [user_message]) if self.cache else None
+        )
+        if cached_reply is not None:
+            # Cache hit - answered without any HTTP request
+            chunks = [cached_reply]
+            yield cached_reply
+        else:
+            chunks = []
+            async for text in self._request_stream(user_fragment):
+                chunks.append(text)
+                yield text
+            # A stream that closes without the end-of-stream marker was cut off -
+            # fail the turn rather than keep a truncated reply in the history
+            if not self._stream_finished:
+                raise Exception("Reply was cut off before the end of the stream")
+            # Only cache complete, non-empty replies - an empty one would be
+            # served as a hit and the question never asked again
+            if self.cache and chunks:
+                self.cache.store(self.model, self.system_message, self.messages + [user_message], "".join(chunks))
+        
+        # Store both messages for conversation continuity
+        self._append_message(user_message, user_fragment)
+        self._append_message({"role": "assistant", "content": "".join(chunks)})
+        # Keep the history within budget for the next request
+        self._trim_history()
+        
+    async def chat(self, user_input: str, on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        # Collect the streamed reply, passing each piece to on_chunk as it arrives
+        try:
+            chunks = []
+            async for chunk in self.chat_stream(user_input):
+                if on_chunk:
+                    on_chunk(chunk)
+                chunks.append(chunk)
+            return "".join(chunks)
             
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             error_msg = "Request timed out"
             print(f"Error: {error_msg}")
-            self.messages.pop()
             return error_msg
-        except requests.exceptions.RequestException as e:
+        except httpx.RequestError as e:
             error_msg = f"Network error: {str(e)}"
             print(f"Error: {error_msg}")
-            self.messages.pop()
             return error_msg
         except Exception as e:
             error_msg = f"Error: {str(e)}"
             print(f"Error: {error_msg}")
-            self.messages.pop()
             return error_msg
 
 
+async def read_input(prompt: str) -> str:
+    # input() blocks, so it runs in a daemon thread while the event loop keeps
+    # serving network I/O (a daemon thread will not hold up exit on Ctrl+C)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def settle(method, value):
+        if not future.done():
+            method(value)
+    
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(settle, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(settle, future.set_result, line)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def chat_loop(chatbot: OpenAIChatbot):
+    try:
+        while True:
+            # Warm up the connection while the user is typing (no-op if already warming)
+            chatbot.keep_warm()
+            try:
+                user_input = await read_input("\nYou: ")
+                
+                if user_input.lower() in ['quit', 'exit']:
+                    print("Goodbye!")
+                    break
+                    
+                elif user_input.lower() == 'clear':
+                    chatbot.clear_conversation()
+                    continue
+                    
+                elif user_input.lower() == 'system':
+                    new_system = await read_input("Enter new system message: ")
+                    chatbot.set_system_message(new_system)
+                    print("System message updated.")
+                    continue
+                    
+                print("\nGPT:")
+                # Print the reply as it streams in; errors are reported by chat()
+                await chatbot.chat(user_input, on_chunk=lambda chunk: print(chunk, end="", flush=True))
+                print()
+                
+            except Exception as e:
+                print(f"Unexpected error: {str(e)}")
+    finally:
+        # Close the pooled connection on exit
+        await chatbot.close()
+
+
 def main():
     # Security: Load API key from environment variable, not hardcoded!
     # This follows the Authorization best practices from the course
@@ -120,33 +404,10 @@ def main():
     print("  • Type 'system' to change system message")
     print("="*50)
     
-    while True:
-        try:
-            user_input = input("\nYou: ")
-            
-            if user_input.lower() in ['quit', 'exit']:
-                print("Goodbye!")
-                break
-                
-            elif user_input.lower() == 'clear':
-                chatbot.clear_conversation()
-                continue
-                
-            elif user_input.lower() == 'system':
-                new_system = input("Enter new system message: ")
-                chatbot.set_system_message(new_system)
-                print("System message updated.")
-                continue
-                
-            print("\nGPT:")
-            response = chatbot.chat(user_input)
-            print(response)
-            
-        except KeyboardInterrupt:
-            print("\nInterrupted. Goodbye!")
-            break
-        except Exception as e:
-            print(f"Unexpected error: {str(e)}")
+    try:
+        asyncio.run(chat_loop(chatbot))
+    except KeyboardInterrupt:
+        print("\nInterrupted. Goodbye!")
 
 
 if __name__ == "__main__":